@@ -0,0 +1,15 @@
+""" Event loop helper shared by the asyncio modules. """
+import asyncio
+try:
+    import uvloop # Faster event loop; not available on Windows.
+except ImportError:
+    uvloop = None
+
+
+def run(main):
+    """ Run main coroutine on uvloop when installed, otherwise on the
+        default asyncio event loop.
+    """
+    if uvloop is not None:
+        return uvloop.run(main)
+    return asyncio.run(main)
@@ -1,21 +1,31 @@
 """ Message Server and Client """
+import os
 import sys
+import stat
 import asyncio
 import logging
+from andy._loop import run
 
 log = logging.getLogger(__name__)
 
+STREAM_LIMIT = 8192 # Stream buffer size in bytes; also the longest allowed message.
+
 class Server:
     """ Simple message server that connects clients. """
-    def __init__(self, host='127.0.0.1', port=1025):
-        """ Give a host and port or use defaults for testing. """
+    PUT_TIMEOUT = 5 # Seconds a sender waits on a full queue before the message is dropped.
+    def __init__(self, host='127.0.0.1', port=1025, queue_max=1024):
+        """ Give a host and port or use defaults for testing.
+            queue_max (int) is the most messages held for any one client.
+        """
         self.host = host
         self.port = port
+        self.queue_max = queue_max
         self.message_queue = {}
 
     async def serve(self):
         """ Start server for listening and sending. """
-        server = await asyncio.start_server(self.proc_client, self.host, self.port)
+        server = await asyncio.start_server(self.proc_client, self.host, self.port,
+                                            limit=STREAM_LIMIT)
         async with server:
             try:
                 await server.serve_forever()
@@ -30,8 +40,8 @@ class Server:
         data = await reader.readline() # Expect client to immediately send their name.
         client = data.decode()[:-1]
         log.info('%s connected from %s.', client, address)
-        if client not in self.message_queue.keys(): # All clients must have a message queue.
-            self.message_queue[client] = asyncio.Queue()
+        if client not in self.message_queue: # All clients must have a message queue.
+            self.message_queue[client] = asyncio.Queue(maxsize=self.queue_max)
 
         write_task = asyncio.create_task(self._write(writer, client))
         await self._read(reader, client)
@@ -39,12 +49,16 @@ class Server:
         log.info('%s is no longer connected from %s.', client, address)
 
     async def _read(self, reader, name):
-        """ Read from stream reader for particular client. """
+        """ Read from stream reader for particular client.  Messages are
+            routed as bytes; only the target user is decoded.  Debug logging
+            formats raw bytes lazily with %r rather than decoding them.
+        """
+        name_prefix = f'{name}:'.encode()
         while True:
             log.debug('read loop for %s.', name)
             try:
                 data = await reader.readline()
-                log.debug('Got something from %s: %s', name, data.decode())
+                log.debug('Got something from %s: %r', name, data)
             except asyncio.CancelledError: # is this a real error?
                 log.debug('ConnectionResetError detected with user %s.', name)
                 break
@@ -52,16 +66,27 @@ class Server:
                 log.debug('not sure, but error for %s: %s', name, e)
                 break
             if data:
-                msg = data.decode()
-                target_user, message = msg.split(':', 1) # All messages are "user:message" format.
-                log.debug('%s sending message "%s" to %s.', name, message, target_user)
-                if target_user not in self.message_queue.keys():
-                    self.message_queue[target_user] = asyncio.Queue()
+                # All messages are "user:message" format.
+                target, sep, message = data.partition(b':')
+                if not sep:
+                    log.warning('Dropping message from %s without a target user.', name)
+                    continue
+                target_user = target.decode()
+                if len(name_prefix) + len(message) > STREAM_LIMIT:
+                    # Forwarded as "sender:message", which can outgrow the
+                    # receiver's readline limit when name is longer than target.
+                    log.warning('Dropping message from %s to %s; over %s bytes with sender name.',
+                                name, target_user, STREAM_LIMIT)
+                    continue
+                log.debug('%s sending message %r to %s.', name, message, target_user)
+                queue = self.message_queue.get(target_user)
+                if queue is None:
+                    queue = asyncio.Queue(maxsize=self.queue_max)
+                    self.message_queue[target_user] = queue
                 try:
-                    await self.message_queue[target_user].put(f'{name}:{message}')
-                except KeyError:
-                    emsg = 'User %s does not have message queue. Cannot send message'
-                    log.warning(emsg, target_user)
+                    await asyncio.wait_for(queue.put(name_prefix + message), self.PUT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    log.warning('Queue for %s is full; dropped message from %s.', target_user, name)
             else:
                 log.debug('Reading no data, so stopping.')
                 # Notice on Linux machine, that reader.read() returns nothing when connection is
@@ -77,16 +102,23 @@ class Server:
         while True:
             log.debug('write loop for %s.', name)
             try:
-                msg = await self.message_queue[name].get()
-                log.debug('message_queue for %s has raw message, "%s"', name, msg)
+                queue = self.message_queue[name]
+                msg = await queue.get()
+                log.debug('message_queue for %s has raw message, %r', name, msg)
             except KeyError:
                 log.warning('User %s does not have a queue.', name)
                 break
             except Exception as e:
                 log.warning('Some unknown error for %s\'s queue: %s', name, e)
                 break
+            buf = [msg]
+            while True: # Send everything already queued in one write.
+                try:
+                    buf.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
             try:
-                writer.write(msg.encode())
+                writer.writelines(buf)
                 await writer.drain()
             except Exception as e:
                 log.warning('Strange writer error with user %s: %s', name, e)
@@ -127,7 +159,8 @@ class Client:
     async def connect(self):
         """ Establish connection with server. """
         log.debug('Client %s loop begin.', self.name)
-        reader, writer = await asyncio.open_connection(self.host, self.port)
+        reader, writer = await asyncio.open_connection(self.host, self.port,
+                                                      limit=STREAM_LIMIT)
         msg = f'{self.name}\n'
         writer.write(msg.encode()) # Once connected, must immediately send client name.
         await writer.drain()
@@ -186,20 +219,66 @@ class CLI(Client):
             user, message = msg.split(':', 1)
             print(f'\n{user}>>{message}\n{self.name}>>', end='')
 
+    @staticmethod
+    async def _stdin_reader():
+        """ Returns (StreamReader, transport) on stdin, or (None, None) where
+            stdin cannot be watched by the event loop (Windows, or stdin
+            redirected from a file or device other than a terminal, pipe or
+            socket).  Close the transport and make stdin blocking again when
+            done; see run().
+        """
+        if os.name == 'nt':
+            return None, None
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+        if not (sys.stdin.isatty() or stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)):
+            return None, None
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        protocol = asyncio.StreamReaderProtocol(reader)
+        # A duplicate fd, so closing the transport leaves sys.stdin open.
+        pipe = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', buffering=0)
+        try:
+            transport, _ = await loop.connect_read_pipe(lambda: protocol, pipe)
+        except (OSError, ValueError):
+            pipe.close()
+            return None, None
+        return reader, transport
+
+    @staticmethod
+    async def _input(reader, prompt):
+        """ Like input(), but awaits the stdin reader instead of blocking a
+            thread.  Falls back to input() in a thread when reader is None.
+        """
+        if reader is None:
+            return await asyncio.to_thread(input, prompt)
+        print(prompt, end='', flush=True)
+        line = await reader.readline()
+        if not line:
+            raise EOFError
+        return line.decode().rstrip('\n')
+
     async def run(self):
         """ This method starts the CLI (Command Line Interface) loop. """
         await self.connect()
         read_task = asyncio.create_task(self.get_messages())
-        while True:
-            message = await asyncio.to_thread(input, f'{self.name}>>')
-            if len(message) < 1:
-                continue
-            if not await self.send(self.friend, message):
-                print('Issue with server.')
-                break
-            if message[:7].lower() == 'goodbye':
-                print('You have left the conversation.')
-                break
+        stdin, transport = await self._stdin_reader()
+        try:
+            while True:
+                message = await self._input(stdin, f'{self.name}>>')
+                if len(message) < 1:
+                    continue
+                if not await self.send(self.friend, message):
+                    print('Issue with server.')
+                    break
+                if message[:7].lower() == 'goodbye':
+                    print('You have left the conversation.')
+                    break
+        finally:
+            if transport is not None:
+                transport.close()
+                # connect_read_pipe made stdin non-blocking.  On a terminal
+                # that is usually stdout too, so always put it back.
+                os.set_blocking(sys.stdin.fileno(), True)
         read_task.cancel()
         log.debug('cli halted.')
 
@@ -214,15 +293,15 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     if len(sys.argv) == 4:
         log.debug('Sending single message.')
-        asyncio.run(single_message(*sys.argv[1:]))
+        run(single_message(*sys.argv[1:]))
     elif len(sys.argv) == 3:
         log.debug('Starting cli.')
         cli = CLI(*sys.argv[1:])
-        asyncio.run(cli.run())
+        run(cli.run())
     else:
         log.debug('Starting server.')
         s = Server()
         try:
-            asyncio.run(s.serve())
+            run(s.serve())
         except KeyboardInterrupt:
             log.info('Keyboard has stopped the server.')
@@ -1,11 +1,60 @@
 """ Costomizing the VISA Device for Hantek DSO2C10 Oscilloscope. """
 import time
-from andy.visa.cli import cli
+import struct
 from andy.visa.comms import Msg, Device
 
+WAV_DATA_ALL = ':WAV:DATA:ALL?'
+# Canned response given in place of sending WAV_DATA_ALL to the instrument.
+WAV_DATA_ALL_FAKE = ('#900000012800000409900000000010-0020000000000004.9e-3204.9e-3184.'
+                     '9e-3184.9e-31810002.500e+04000001+0.00e+00+0.00e+00000893779')
+
+# (key, start, end) of each ':WAV:DATA:ALL?' header field.
+WAVEFORM_FIELDS = (
+    ('#9', 0, 2),
+    ('packet byte length', 2, 11),
+    ('amount of data', 11, 20),
+    ('uploaded data length', 20, 29),
+    ('running status', 29, 30),
+    ('trigger status', 30, 31),
+    ('ch1 offset', 31, 35),
+    ('ch2 offset', 35, 39),
+    ('ch3 offset', 39, 43),
+    ('ch4 offset', 43, 47),
+    ('ch1 voltage', 47, 54),
+    ('ch2 voltage', 55, 61),
+    ('ch3 voltage', 61, 68),
+    ('ch4 voltage', 68, 75),
+    ('ch enabled', 75, 79),
+    ('sample rate', 79, 88),
+    ('sampling multiple', 88, 94),
+    ('trigger time', 94, 103),
+    ('data aqu start time', 103, 112),
+    ('reserved bits', 112, 128),
+)
+WAVEFORM_KEYS = tuple(key for key, _, _ in WAVEFORM_FIELDS)
+WAVEFORM_TEXT_KEYS = ('#9', 'ch enabled', 'reserved bits') # Never parsed as numbers.
+
+
+def _waveform_struct(fields):
+    """ Build a struct of fixed width byte strings for fields, padding any
+    gap between them.
+    """
+    fmt = ''
+    pos = 0
+    for _, start, end in fields:
+        if start > pos:
+            fmt += f'{start - pos}x'
+        fmt += f'{end - start}s'
+        pos = end
+    return struct.Struct(fmt)
+
+
+WAVEFORM_STRUCT = _waveform_struct(WAVEFORM_FIELDS)
+
 
 class DSO2000Msg(Msg):
     """ A message for the DSO2000 Series Digital Oscilloscope. """
+    __slots__ = ()
     def __init__(self, cmd=''):
         """ Contains a creation time and ASCII command.
 
@@ -41,56 +90,90 @@ class DSO2000Msg(Msg):
         1) The DSO2000 manual states ":" is required before all commands, but
          this is not true.  Commands missing colon prefixed work.
         """
-        cmd = str(cmd) # Make sure input is a string.
+        cmd = str(cmd).strip() # Make sure input is a string.
         if cmd == '':
             self.response = self.SYNTAX_ERR
-        elif cmd[0] != ':':
+            return cmd
+        if cmd[0] != ':':
             cmd = f':{cmd}'
 
-        parts = cmd.split()
+        # Only the command header is case normalized, never its argument.
+        # Any run of whitespace (space, tab) separates the two.
+        parts = cmd.split(None, 1)
         front = parts[0].upper()
-        try:
-            back = f' {parts[1]}'
-        except IndexError:
-            back = ''
+        back = f' {parts[1]}' if len(parts) > 1 else ''
         cmd = f'{front}{back}'
 
-        if cmd == ':WAV:DATA:ALL?':
+        if cmd == WAV_DATA_ALL:
             # This cmd works once, then times out after that.  I do not get it.
             # Temporary solution is to hid this cmd from Instrument and always
             # give fake response.
-            self.response = '#900000012800000409900000000010-0020000000000004.9e-3204.9e-3184.9e-3184.9e-31810002.500e+04000001+0.00e+00+0.00e+00000893779'
-            self.send_time = time.time()
-            self.response_time = self.send_time
+            self.response = WAV_DATA_ALL_FAKE
+            if self.TIMING:
+                self.send_time = time.time()
+                self.response_time = self.send_time
 
         return cmd
 
 
 def proc_waveform_data(data):
-    """ This processes commmand ':WAV:DATA:ALL?' """
-    d = {}
-    d['#9'] = data[0:2]
-    d['packet byte length'] = data[2:11]
-    d['amount of data'] = data[11:20]
-    d['uploaded data length'] = data[20:29]
-    d['running status'] = data[29]
-    d['trigger status'] = data[30]
-    d['ch1 offset'] = data[31:35]
-    d['ch2 offset'] = data[35:39]
-    d['ch3 offset'] = data[39:43]
-    d['ch4 offset'] = data[43:47]
-    d['ch1 voltage'] = data[47:54]
-    d['ch2 voltage'] = data[55:61]
-    d['ch3 voltage'] = data[61:68]
-    d['ch4 voltage'] = data[68:75]
-    d['ch enabled'] = data[75:79]
-    d['sample rate'] = data[79:88]
-    d['sampling multiple'] = data[88:94]
-    d['trigger time'] = data[94:103]
-    d['data aqu start time'] = data[103:112]
-    d['reserved bits'] = data[112:128]
+    """ This processes commmand ':WAV:DATA:ALL?'
+
+    Inputs:
+        data (str or bytes-like): The response.  A str gives str fields by
+            slicing.  Bytes (e.g. from read_raw) give bytes fields, unpacked
+            by a single precompiled struct call without per-field slicing.
+            A response shorter than the header gives short fields either way.
+    """
+    if isinstance(data, str):
+        return {key: data[start:end] for key, start, end in WAVEFORM_FIELDS}
+    if len(data) < WAVEFORM_STRUCT.size: # Too short to unpack; slice as for str.
+        data = bytes(data)
+        return {key: data[start:end] for key, start, end in WAVEFORM_FIELDS}
+    return dict(zip(WAVEFORM_KEYS, WAVEFORM_STRUCT.unpack_from(data)))
+
+def _number(text):
+    """ Return text as an int or float when it is one, otherwise as is. """
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def proc_waveform_data_np(data):
+    """ Like proc_waveform_data, but numeric header fields (all except
+    WAVEFORM_TEXT_KEYS) are converted to int or float once, and the samples
+    following the header are returned under 'samples' as a numpy int8 array
+    viewing the response buffer.  Requires numpy.
+
+    Each numeric field is an int or float when its text parses, otherwise
+    it is left as the str--the canned response has some, e.g. 'ch3 voltage'
+    is '184.9e-'.  When 'uploaded data length' is not an int, 'samples' is
+    empty.
+
+    Inputs:
+        data (str or bytes-like): The response to ':WAV:DATA:ALL?'.
+    """
+    import numpy as np # Optional dependency; only needed here.
+    fields = proc_waveform_data(data)
+    if isinstance(data, str):
+        data = data.encode('latin-1')
+    else:
+        fields = {key: val.decode('latin-1') for key, val in fields.items()}
+    d = {key: val if key in WAVEFORM_TEXT_KEYS else _number(val)
+         for key, val in fields.items()}
+    length = d['uploaded data length']
+    if not isinstance(length, int):
+        length = 0
+    header = WAVEFORM_FIELDS[-1][2]
+    d['samples'] = np.frombuffer(memoryview(data)[header:header + length], dtype=np.int8)
     return d
 
+
 def main():
     """
     On Windows, it was discovered that installing Hantek software would
@@ -103,6 +186,7 @@ def main():
     On my Windows Surface Pro, the Hantek software never connected to the
     oscilloscope.  I gave up.
     """
+    from andy.visa.cli import cli # Only the CLI needs it, not the parsing helpers.
     cli(DSO2000Msg)
 
 def test():
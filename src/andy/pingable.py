@@ -1,13 +1,132 @@
 """Compare ip address ping results on different subnets."""
 
 import os
+import re
 import sys
 import logging
+import socket
+import struct
 import asyncio
+import weakref
+import itertools
 import ipaddress
+from andy._loop import run
 
 logger = logging.getLogger(__name__)
 
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_PAYLOAD = bytes(32)
+_IPV4_STRUCT = struct.Struct('!I') # Packs an int ip address for socket.inet_ntoa.
+
+_OCTET = '(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+_DOTTED_24 = re.compile(rf'{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}/24')
+
+
+def icmp_checksum(data):
+    """ Internet checksum (16 bit one's complement sum) of given bytes. """
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_socket():
+    """ Returns a non-blocking ICMP socket or None when the OS allows none.
+        An unprivileged datagram socket (Linux within net.ipv4.ping_group_range,
+        macOS) is preferred over a raw socket, which needs root.  Windows
+        always gets None.
+    """
+    if os.name == 'nt':
+        return None
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock
+    return None
+
+
+class IcmpEcho():
+    """ One ICMP socket shared by any number of concurrent echo requests.
+    A single reader callback matches each reply to its waiting request by
+    (ip, sequence), so no process or socket is created per ping.  Must be
+    created inside a running event loop; use as a context manager.
+    """
+    __slots__ = ('_loop', '_sock', '_raw', '_pending')
+    IDENT = os.getpid() & 0xffff # Only checked on raw sockets; see _on_readable.
+    _seq = itertools.count() # Shared so concurrent instances never reuse a sequence.
+
+    def __init__(self):
+        """ Open the socket and start reading replies.
+            Raises OSError when no ICMP socket is allowed.
+        """
+        self._sock = icmp_socket()
+        if self._sock is None:
+            raise OSError('ICMP sockets are not available')
+        self._raw = self._sock.type == socket.SOCK_RAW
+        self._pending = {}
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._sock.fileno(), self._on_readable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop reading and close the socket. """
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+
+    def _packet(self, seq):
+        """ Returns an echo request packet for sequence number seq. """
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.IDENT, seq)
+        checksum = icmp_checksum(header + ICMP_PAYLOAD)
+        return header[:2] + struct.pack('!H', checksum) + header[4:] + ICMP_PAYLOAD
+
+    def _on_readable(self):
+        """ Drain the socket, resolving the request each echo reply answers. """
+        while True:
+            try:
+                data, (ip, _) = self._sock.recvfrom(1500)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError: # A queued ICMP error; reading it clears it.
+                continue
+            if data and data[0] >> 4 == 4: # Raw sockets (and macOS) include the IP header.
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8 or data[0] != ICMP_ECHO_REPLY:
+                continue
+            ident, seq = struct.unpack_from('!HH', data, 4)
+            # Raw sockets see every echo reply on the host.  Datagram sockets
+            # only get their own, with ident rewritten by the kernel.
+            if self._raw and ident != self.IDENT:
+                continue
+            future = self._pending.get((ip, seq))
+            if future is not None and not future.done():
+                future.set_result(True)
+
+    async def ping(self, ip, timeout):
+        """ Returns True when ip answers an echo request within timeout seconds. """
+        seq = next(self._seq) & 0xffff
+        key = (ip, seq)
+        future = self._pending[key] = self._loop.create_future()
+        try:
+            # Datagram sendto() does not block in practice, and a plain call
+            # works on any loop (uvloop lacks sock_sendto).
+            self._sock.sendto(self._packet(seq), (ip, 0))
+            return await asyncio.wait_for(future, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            del self._pending[key]
+
 
 class IPv4Net(ipaddress.IPv4Network):
     """ Specialized IPv4Network with CIDR restriction. """
@@ -26,10 +145,22 @@ class IPv4Net(ipaddress.IPv4Network):
         self.require_24_cidr = require_24_cidr
         self.check_cidr()
 
+    @classmethod
+    def from_string_fast(cls, address='192.168.0.0/24', require_24_cidr=False):
+        """ Same as IPv4Net(address), but the common "a.b.c.d/24" form is
+        matched by one precompiled regex and converted with inet_aton instead
+        of the ipaddress string parser.  Any other form falls back to the
+        general path.
+        """
+        if _DOTTED_24.fullmatch(address):
+            addr = int.from_bytes(socket.inet_aton(address[:-3]), 'big')
+            return cls((addr & 0xffffff00, 24), require_24_cidr=require_24_cidr)
+        return cls(address, require_24_cidr=require_24_cidr)
+
     def check_cidr(self):
         """ Special check for CIDR of exactly /24. """
         if self.require_24_cidr:
-            if str(self.netmask) != '255.255.255.0':
+            if self.prefixlen != 24:
                 msg = f'Given network-->{self} has an invalid CIDR.  Only /24 CIDR is allowed.\n'
                 msg += '  Example: "192.168.1.0/24"'
                 raise ipaddress.AddressValueError(msg)
@@ -37,66 +168,229 @@ class IPv4Net(ipaddress.IPv4Network):
 
 class Pingable():
     """Class for testing pings on subnets."""
-    MAX_PING_PROC = 200 # Limit the maximum number of ping tasks.
-    def __init__(self, network=None, ip_ignore_list=None, retries=1):
+    __slots__ = ('_network', '_hosts', '_all_ips', 'retries', 'pingable_ips',
+                 '_ip_ignore_set', 'max_concurrency', 'windows', '_backend', '_ping_argv')
+    MAX_PING_PROC = 64 # Default limit on the number of concurrent ping tasks.
+    PING_TIMEOUT = 1.0 # Seconds to wait for an ICMP echo reply.
+    PING_COMMAND_TIMEOUT = 2.0 # Seconds before a ping command is killed.
+    # Limit on ping commands running at once across all Pingable objects.
+    MAX_PING_COMMANDS = (os.cpu_count() or 1) * 16
+    # Shared by all instances and subclasses; see command_semaphore().
+    _command_semaphores = weakref.WeakKeyDictionary() # {event loop: Semaphore}
+    def __init__(self, network=None, ip_ignore_list=None, retries=1,
+                 max_concurrency=MAX_PING_PROC):
         """ This class can ping each host within a particular network using
-        the ping command.
+        ICMP echo sockets, or the ping command when sockets are not allowed.
 
         Inputs:
-        network -- An IPv4Net type
+        network -- An IPv4Net type, or a CIDR string such as "192.168.1.0/24"
         ip_ignore_list -- A list of ints representing the last octet of ip.
             Matching ip adresses will be ignored.
         retries -- The number of times each ping will be repeated if not found.
+        max_concurrency -- The maximum number of pings in flight at once.
         """
         if network is None:
             network = IPv4Net()
         self.network = network
         self.retries = retries
         self.pingable_ips = {}
+        self._ip_ignore_set = frozenset()
         if ip_ignore_list is None:
             ip_ignore_list = []
-        self.ip_ignore_list = ip_ignore_list # list of ints (last octet of ip)
-        self._semaphore = asyncio.Semaphore(self.MAX_PING_PROC)
+        self.ip_ignore_list = ip_ignore_list # ints (last octet of ip)
+        self.max_concurrency = max_concurrency
         self.windows = os.name == 'nt'
+        self._ping_argv = ('ping', '-n' if self.windows else '-c', '1')
+        sock = icmp_socket()
+        self._backend = 'subprocess' if sock is None else 'icmp'
+        if sock is not None:
+            sock.close()
+
+    @property
+    def network(self):
+        """ The IPv4Net being pinged. """
+        return self._network
+
+    @network.setter
+    def network(self, network):
+        """ Accepts an IPv4Net or a CIDR string.  Caches the hosts, both as
+            ints and as strings, so ips() only has to filter them.
+        """
+        if isinstance(network, str):
+            network = IPv4Net(network)
+        self._network = network
+        base = int(network.network_address)
+        num = network.num_addresses
+        if num > 2: # Skip network and broadcast addresses, like hosts().
+            self._hosts = range(base + 1, base + num - 1)
+        else: # A /31 or /32 has no network or broadcast address.
+            self._hosts = range(base, base + num)
+        ntoa = socket.inet_ntoa
+        pack = _IPV4_STRUCT.pack
+        self._all_ips = [ntoa(pack(i)) for i in self._hosts]
+
+    @property
+    def ip_ignore_list(self):
+        """ Sorted list of last octets to ignore. """
+        return sorted(self._ip_ignore_set)
+
+    @ip_ignore_list.setter
+    def ip_ignore_list(self, ignore_list):
+        """ Validate once here, keeping only int octets 1 through 254.  A
+            string is not a list of octets, so it is rejected and the current
+            list is kept.
+        """
+        if isinstance(ignore_list, (str, bytes)):
+            logger.warning('Ignoring invalid ip_ignore_list %r.', ignore_list)
+            return
+        self._ip_ignore_set = frozenset(
+            octet for octet in ignore_list if isinstance(octet, int) and 0 < octet < 255)
 
     def ips(self, use_ignore_set=True, remove_found=True):
         """ Returns a list (comprehension) of all ip addresses in subnet as
-            strings.
+            strings.  Filters the host strings cached by the network setter.
         """
-        ips = [ip.exploded for ip in self.network.hosts()]
-        if use_ignore_set:
-            ip_ignore_set = {octet for octet in self.ip_ignore_list if 0 < octet < 255}
-            ips = [ip for ip in ips if int(ip.split('.')[3]) not in ip_ignore_set]
-        if remove_found:
-            ip_found_list = [ip for ip, found in self.pingable_ips.items() if found]
-            ips = [ip for ip in ips if ip not in ip_found_list]
-        return ips
-
-    async def ping_ip(self, ip):
-        """ Ping given ip address using host OS.
-            Command and result will be unique on different OS (Windows vs. Linux).
+        ignore = self._ip_ignore_set if use_ignore_set else ()
+        found = self.pingable_ips if remove_found else {}
+        if not ignore and not found:
+            return list(self._all_ips)
+        return [ip for i, ip in zip(self._hosts, self._all_ips)
+                if (i & 0xff) not in ignore and not found.get(ip, False)]
+
+    async def ping_ip(self, ip, icmp=None):
+        """ Ping given ip address with an ICMP echo, or with the host OS ping
+            command when ICMP sockets are unavailable.
+            icmp -- The IcmpEcho shared by a sweep.  When None, one is opened
+                for this ip alone.
+        """
+        if self._backend == 'icmp' and icmp is None:
+            with IcmpEcho() as icmp: # Called on its own, outside of aping_ips.
+                found = await self._ping_retries(ip, icmp)
+        else:
+            found = await self._ping_retries(ip, icmp)
+        self.pingable_ips[ip] = found
+        logger.debug('%s %s', ip, 'Found' if found else 'Missing')
+
+    async def _ping_retries(self, ip, icmp):
+        """ Send up to retries pings, stopping at the first reply.
+            A None icmp uses the ping command instead.
         """
-        async with self._semaphore:
-            result = await asyncio.create_subprocess_shell(
-                f'ping {"-n" if self.windows else "-c"} 1 {ip}',
-                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-            stout, _ = await result.communicate()
-            key = 'bytes=' if self.windows else 'rtt min/avg/max/mdev'
-            self.pingable_ips[ip] = key in str(stout)
-            logger.debug('%s %s', ip, 'Found' if self.pingable_ips[ip] else 'Missing')
-
-    async def _ping_ips(self):
-        """ Put all ping commands in separate asyncio tasks. """
         for _ in range(self.retries):
-            tasks = [asyncio.create_task(self.ping_ip(ip)) for ip in self.ips()]
-            await asyncio.wait(tasks)
+            if icmp is None:
+                async with self.command_semaphore():
+                    found = await self._subprocess_ping(ip)
+            else:
+                found = await icmp.ping(ip, self.PING_TIMEOUT)
+            if found:
+                return True
+        return False
 
-    def ping_ips(self):
-        """ Ping all ip addresses in subnet. """
+    @staticmethod
+    def command_semaphore():
+        """ Returns the semaphore every Pingable, of any subclass, holds
+            while a ping command runs, so concurrent sweeps together never
+            exceed MAX_PING_COMMANDS processes.  A semaphore belongs to one
+            event loop, so one is kept per loop, and dropped with its loop.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = Pingable._command_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(Pingable.MAX_PING_COMMANDS)
+            Pingable._command_semaphores[loop] = semaphore
+        return semaphore
+
+    async def _subprocess_ping(self, ip):
+        """ Ping given ip address using host OS ping command.  The command is
+            killed once the answer is known or after PING_COMMAND_TIMEOUT.
+        """
+        try:
+            result = await asyncio.create_subprocess_exec(
+                *self._ping_argv, ip,
+                stdout=asyncio.subprocess.PIPE if self.windows else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=4096) # ping output is only a few short lines.
+        except OSError as e:
+            logger.warning('Unable to run ping command: %s', e)
+            return False
+        try:
+            return await asyncio.wait_for(self._ping_result(result), self.PING_COMMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if result.returncode is None:
+                try:
+                    result.kill()
+                except ProcessLookupError: # Exited on its own meanwhile.
+                    pass
+                await result.wait()
+
+    async def _ping_result(self, result):
+        """ An exit status of 0 means a reply came back.  Windows ping also
+            exits with 0 for "Destination host unreachable" replies, so there
+            stdout is read line by line until a real echo reply shows up.
+        """
+        if self.windows:
+            async for line in result.stdout:
+                if b'bytes=' in line:
+                    return True
+            return False
+        return await result.wait() == 0
+
+    async def aping_ips(self):
+        """ Ping all ip addresses in subnet within the running event loop.
+            The semaphore keeps at most max_concurrency pings in flight, so
+            large subnets do not spawn every ping process at once.
+        """
         logger.info('Attempting to ping subnet %s', self.network)
-        asyncio.run(self._ping_ips())
+        semaphore = asyncio.Semaphore(self.max_concurrency) # Bound to running loop.
+
+        # Local to this sweep, so concurrent sweeps of one Pingable each get their own.
+        icmp = IcmpEcho() if self._backend == 'icmp' else None
+
+        async def _one(ip):
+            async with semaphore:
+                try:
+                    await self.ping_ip(ip, icmp)
+                except Exception as e: # Do not let one host cancel the whole TaskGroup.
+                    logger.warning('Ping of %s failed: %s', ip, e)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for ip in self.ips():
+                    group.create_task(_one(ip))
+        finally:
+            if icmp is not None:
+                icmp.close()
         logger.info('All ip addresses in subnet %s have been pinged', self.network)
 
+    def ping_ips(self):
+        """ Ping all ip addresses in subnet. """
+        run(self.aping_ips())
+
+
+def ping_subnets(*pingables):
+    """ Ping all ip addresses of every given Pingable.  The sweeps share one
+        event loop and run concurrently, so the total time is about that of
+        the slowest subnet rather than the sum.
+    """
+    async def _ping_all():
+        await asyncio.gather(*(pingable.aping_ips() for pingable in pingables))
+
+    run(_ping_all())
+
+
+def compare_dicts(dict_1, dict_2):
+    """ Compare values of keys found in both dictionaries.
+
+    Returns a dictionary of each shared key whose values differ, mapped to
+    [dict_1 value, dict_2 value].  Shared keys come from a C-level set
+    intersection of the key views, so keys missing from either side cost
+    nothing.
+    """
+    common = dict_1.keys() & dict_2.keys()
+    return {key: [dict_1[key], dict_2[key]] for key in common
+            if dict_1[key] != dict_2[key]}
+
 
 def compare_subnets(ping_1, ping_2):
     """ Compare ping results of all hosts in two networks.
@@ -110,18 +404,18 @@ def compare_subnets(ping_1, ping_2):
         different success value.  Note, this only works with hostmasks
         of 0.0.0.255 or subnets there of.
     """
-    ping_1.ping_ips()
-    pingable_1 = {key.split('.')[3]:val for key, val in ping_1.pingable_ips.items()}
-    network_1_front = str(ping_1.network).rsplit('.', maxsplit=1)[0]
+    ping_subnets(ping_1, ping_2)
+    # Key by last octet as an int; only the last dot needs splitting.
+    pingable_1 = {int(key.rsplit('.', 1)[1]):val for key, val in ping_1.pingable_ips.items()}
+    prefix_1 = str(ping_1.network).rsplit('.', maxsplit=1)[0] + '.'
 
-    ping_2.ping_ips()
-    pingable_2 = {key.split('.')[3]:val for key, val in ping_2.pingable_ips.items()}
-    network_2_front = str(ping_2.network).rsplit('.', maxsplit=1)[0]
+    pingable_2 = {int(key.rsplit('.', 1)[1]):val for key, val in ping_2.pingable_ips.items()}
+    prefix_2 = str(ping_2.network).rsplit('.', maxsplit=1)[0] + '.'
 
-    return [[{f'{network_1_front}.{key}':val},
-             {f'{network_2_front}.{key}':pingable_2[key]}]
+    # A key missing from pingable_2 defaults to val, so it never differs.
+    return [[{prefix_1 + str(key):val}, {prefix_2 + str(key):pingable_2[key]}]
             for key, val in pingable_1.items()
-            if key in pingable_2 and pingable_2[key] != val]
+            if pingable_2.get(key, val) != val]
 
 def main():
     """ Handle CLI """
@@ -136,8 +430,8 @@ def main():
         print('   $ compare_subnets 192.168.0.0/24 192.168.1.0/24')
         subnet_1 = '192.168.0.0/24'
         subnet_2 = '192.168.1.0/24'
-    net_1 = IPv4Net(subnet_1)
-    net_2 = IPv4Net(subnet_2)
+    net_1 = IPv4Net.from_string_fast(subnet_1)
+    net_2 = IPv4Net.from_string_fast(subnet_2)
     print(f'Pinging all hosts in {net_1} and {net_2}...')
     results = compare_subnets(Pingable(net_1), Pingable(net_2))
     for each in results:
@@ -1,5 +1,6 @@
 """ Demonstrate a threaded queue where add and remove actions could take a long
 time, such as talking to a database. """
+import queue
 import threading
 import time
 
@@ -8,18 +9,17 @@ class ThreadedQueue():
     def __init__(self):
         """ Create attributes and start action thread. """
         self.queue = []
-        self.action_queue = []
-        self.sleep_time = 0.01 # Time in seconds.
+        self.action_queue = queue.Queue() # get() blocks until an action arrives.
         action_thread = threading.Thread(target=self.action_thread, daemon=True)
         action_thread.start()
 
     def add(self, item):
         """ User facing add method. """
-        self.action_queue.append(('add', item))
+        self.action_queue.put(('add', item))
 
     def remove(self, index=0):
         """ User facing remove method. """
-        self.action_queue.append(('remove', index))
+        self.action_queue.put(('remove', index))
 
     def get(self, number):
         """ User facing get which uses localy stored data. """
@@ -31,12 +31,7 @@ class ThreadedQueue():
     def action_thread(self):
         """ The action thread where add and remove requests are initiated. """
         while True:
-            try:
-                action = self.action_queue.pop(0)
-            except IndexError:
-                time.sleep(self.sleep_time)
-                continue
-
+            action = self.action_queue.get()
             if action[0] == 'remove':
                 self._long_process_remove(action[1])
             else:
@@ -1,5 +1,8 @@
 """ A generic Command Line Interface for a VISA Device. """
 import sys
+import asyncio
+import threading
+from concurrent.futures import Future
 from andy.visa.comms import Device, Msg
 
 def user_selects_device(visa_instrument):
@@ -24,32 +27,55 @@ def user_selects_device(visa_instrument):
         visa_instrument.reset_device()
     print(f'Using --> {visa_instrument.device}')
 
-def process_user_cmd(visa_instrument, cls=Msg):
-    """ UI for command entry. """
-    cmd = input('Enter ASCII command: ')
-    cmd_lower = cmd.lower()
-    if cmd_lower == 'exit':
-        sys.exit(0)
-    elif cmd_lower == 'device':
-        print(visa_instrument.device)
+async def process_user_cmd(visa_instrument, cmd, cls=Msg):
+    """ Send cmd and print the result once the instrument answers. """
+    msg = await visa_instrument.asend(cmd, cls)
+    print(f'Sent --> {msg.cmd}')
+    if msg.response == msg.OK:
+        print('Response --> N/A')
     else:
-        msg = visa_instrument.send(cmd, cls)
-        print(f'Sent --> {msg.cmd}')
-        if msg.response == msg.OK:
-            print('Response --> N/A')
+        print(f'Response --> {msg.response}')
+
+async def _input(prompt):
+    """ input() without blocking the event loop.  It runs in a daemon thread
+    which is never joined, so Ctrl-C exits at once while input() still waits.
+    """
+    future = Future()
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            if not future.cancelled():
+                future.set_exception(e)
         else:
-            print(f'Response --> {msg.response}')
+            if not future.cancelled(): # The awaiting task was cancelled.
+                future.set_result(line)
+    threading.Thread(target=read, daemon=True).start()
+    return await asyncio.wrap_future(future)
 
-def _cli(cls):
-    """ UI helper
+async def _cli(cls):
+    """ UI helper.  Each command is sent in the background, so the prompt
+    comes back while a slow query is still in flight.
 
     Inputs:
         cls (Message class): The message class--not object.
     """
-    visa_instrument = Device()
-    user_selects_device(visa_instrument)
-    while True:
-        process_user_cmd(visa_instrument, cls)
+    with Device() as visa_instrument:
+        user_selects_device(visa_instrument)
+        in_flight = set()
+        while True:
+            cmd = await _input('Enter ASCII command: ')
+            cmd_lower = cmd.lower()
+            if cmd_lower == 'exit':
+                break
+            if cmd_lower == 'device':
+                print(visa_instrument.device)
+                continue
+            task = asyncio.create_task(process_user_cmd(visa_instrument, cmd, cls))
+            in_flight.add(task) # Keep a reference until the task is done.
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
 
 def cli(cls=Msg):
     """ UI logic
@@ -58,7 +84,7 @@ def cli(cls=Msg):
         cls (Message class): The message class--not object.
     """
     try:
-        _cli(cls)
+        asyncio.run(_cli(cls))
     except KeyboardInterrupt:
         pass
 
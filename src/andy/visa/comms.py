@@ -2,16 +2,25 @@
 import warnings
 import time
 import os
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
 import pyvisa
 
 
 class Msg():
     """ A generic VISA message. """
+    __slots__ = ('creation_time', 'send_time', 'response_time', 'timeout', 'response',
+                 'orig_cmd', 'cmd', 'is_query')
     COM_ERR = 'comm error'
     PROCESSING = 'processing'
     TIMEOUT = 'timeout'
     SYNTAX_ERR = 'syntax error'
     OK = 'success'
+    # Record creation/send/response times.  Set VISA_MSG_TIMING=0 to skip the
+    # time.time() calls when streaming many commands.
+    TIMING = os.environ.get('VISA_MSG_TIMING', '1') != '0'
 
     def __init__(self, cmd=''):
         """ Contains a creation time and ASCII command.
@@ -20,13 +29,14 @@ class Msg():
             cmd (str): The command in the message can be specified during
                 creation.
         """
-        self.creation_time = time.time()
+        self.creation_time = time.time() if self.TIMING else 0.0
         self.send_time = None
         self.response_time = None
         self.timeout = None # Wait duration in ms
         self.response = self.PROCESSING
         self.orig_cmd = cmd # Before validation
         self.cmd = self.validate(cmd)
+        self.is_query = self.cmd.endswith('?') # Set after any subclass validation.
 
     def __str__(self):
         """ What this class looks like when printed as a string. """
@@ -60,6 +70,7 @@ class Device():
     """
     TIMEOUT_MS = 1000
     TIMEOUT_ERR = 'Timeout error'
+    RESOURCES_TTL = 2.0 # Seconds list_devices() reuses its last (slow) scan.
 
     def __init__(self, name=''):
         """ Initialize VISA device.
@@ -72,8 +83,40 @@ class Device():
         if os.name == 'nt': # A Windows machine
             self.end_char_len = 2 # Windows is observed to append 2 chars.
         self._rm = pyvisa.ResourceManager('@py') # Use Python as VISA backend
+        # Held while opening, closing or listing resources, which any thread
+        # may do.  The I/O itself is only done by the I/O thread.
+        self._lock = threading.RLock()
+        self._resources_cache = None
+        self._resources_cache_time = 0.0
+        self._handle = None # Last opened resource; kept open for reuse.
         self._device_name = name
         self._device = self._get_device(self._device_name)
+        self._io_queue = queue.Queue() # (Msg, Future) waiting for the I/O thread.
+        self._queue_lock = threading.Lock() # Nothing is queued after close()'s sentinel.
+        self._io_thread = threading.Thread(target=self._io_loop, daemon=True)
+        self._io_thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Stop the I/O thread once queued messages are sent, then close the
+        open resource and the resource manager.  The Device cannot send after
+        this.
+        """
+        with self._queue_lock:
+            thread, self._io_thread = self._io_thread, None
+            if thread is None:
+                return
+            self._io_queue.put((None, None)) # Sentinel; stops _io_loop.
+        thread.join()
+        with self._lock:
+            self._device = None
+            self._close_handle()
+            self._rm.close()
 
     @property
     def name(self):
@@ -97,17 +140,48 @@ class Device():
         self.reset_device()
         self._device_name = name
 
-    def list_devices(self):
+    def list_devices(self, force=False):
         """ List available VISA devices.
         Note: Connected devices will not appear in list.  You may want to
         device.reset_device() to see it listed.
+
+        Inputs:
+            force (bool): Scan again even if the last scan is less than
+                RESOURCES_TTL seconds old.  Scanning USB/TCPIP is slow.
         """
-        with warnings.catch_warnings(action='ignore'):
-            return self._rm.list_resources()
+        with self._lock:
+            now = time.monotonic()
+            if (force or self._resources_cache is None
+                    or now - self._resources_cache_time >= self.RESOURCES_TTL):
+                with warnings.catch_warnings(action='ignore'):
+                    self._resources_cache = self._rm.list_resources()
+                self._resources_cache_time = now
+            return self._resources_cache
+
+    def reset_device(self, rescan=False):
+        """ Force device reset.  The open resource is kept and reused when
+        it still matches the device name.
 
-    def reset_device(self):
-        """ Force device reset. """
-        self._device = None
+        Inputs:
+            rescan (bool): Also close the open resource and forget the
+                cached device list, e.g. after a communication error.
+        """
+        with self._lock:
+            if rescan:
+                self._resources_cache = None
+                self._close_handle()
+            self._device = None
+
+    def _close_handle(self):
+        """ Close the open resource, if any.  A failed or unplugged device
+        may fail to close; it is forgotten either way.
+        """
+        handle, self._handle = self._handle, None
+        if handle is not None:
+            try:
+                handle.close()
+            except (pyvisa.errors.VisaIOError, OSError):
+                pass
 
     def _get_device(self, pn=''):
         """ Return the VISA resource or None if not found.  Selects random
@@ -121,11 +195,16 @@ class Device():
         Note: Users should use device property to obtain resource--not this
         method; therefore, this method has been marked private.
         """
+        handle = self._handle
+        if handle is not None and pn in handle.resource_name:
+            return handle
         devices = [d for d in self.list_devices() if pn in d]
         if len(devices) == 0:
             return None
         device = self._rm.open_resource(devices[0])
         device.timeout = self.TIMEOUT_MS
+        self._close_handle()
+        self._handle = device
         return device
 
     @property
@@ -133,47 +212,73 @@ class Device():
         """ Return current open device, opens device and returns it,
         or returns None.
         """
-        if self._device is not None:
+        with self._lock:
+            if self._device is None:
+                self._device = self._get_device(self._device_name)
             return self._device
-        self._device = self._get_device(self._device_name)
-        return self._device
 
     def _write(self, msg):
         """ Process write; store results in msg. """
-        msg.send_time = time.time()
+        if msg.TIMING:
+            msg.send_time = time.time()
         try:
             result = self.device.write(msg.cmd)
         except ValueError:
             result = -1
         except pyvisa.errors.VisaIOError:
             result = -2
-        msg.response_time = time.time()
+        if msg.TIMING:
+            msg.response_time = time.time()
         if result - self.end_char_len == len(msg.cmd):
             # This is not verification that the instrument recieved message.
             # It only means the message was sent, or does it?
             msg.response = msg.OK
         elif result == -1:
             msg.response = msg.COM_ERR
-            self.reset_device()
+            self.reset_device(rescan=True)
         elif result == -2:
             msg.response = msg.TIMEOUT
-            self.reset_device()
+            self.reset_device(rescan=True)
         else:
             # Maybe 2 chars at end of ASCII string.
             msg.response = f'{msg.COM_ERR}: {len(msg.cmd)} != {result}!'
 
     def _query(self, msg):
         """ Process query; store results in msg. """
-        msg.send_time = time.time()
+        if msg.TIMING:
+            msg.send_time = time.time()
         try:
             msg.response = self.device.query(msg.cmd)
         except ValueError:
             msg.response = msg.COM_ERR
-            self.reset_device()
+            self.reset_device(rescan=True)
         except pyvisa.errors.VisaIOError:
             msg.response = msg.TIMEOUT
-            self.reset_device()
-        msg.response_time = time.time()
+            self.reset_device(rescan=True)
+        if msg.TIMING:
+            msg.response_time = time.time()
+
+    def submit(self, cmd, cls=Msg):
+        """ Queue a command for the device I/O thread without waiting.
+
+        Inputs are the same as send().  The Msg is created and validated
+        here, in the caller's thread, so it overlaps any transfer in flight.
+
+        Returns a concurrent.futures.Future whose result is the Msg.
+        """
+        if isinstance(cmd, str):
+            msg = cls(cmd)
+        else:
+            msg = cmd
+        future = Future()
+        with self._queue_lock:
+            if self._io_thread is None:
+                raise RuntimeError('Device is closed')
+            if msg.response != msg.PROCESSING: # Validation answered; nothing to send.
+                future.set_result(msg)
+            else:
+                self._io_queue.put((msg, future))
+        return future
 
     def send(self, cmd, cls=Msg):
         """ Send a command to the VISA instrument.
@@ -191,31 +296,48 @@ class Device():
         Returns a Msg object.  See Msg object below.
             Use msg.response to see status/response of command.
         """
-        if isinstance(cmd, str):
-            msg = cls(cmd)
-        else:
-            msg = cmd
+        return self.submit(cmd, cls).result()
+
+    async def asend(self, cmd, cls=Msg):
+        """ Awaitable send.  The device I/O thread does the work so the event
+        loop keeps running while the instrument answers.  Inputs and return
+        value are the same as send().
+        """
+        return await asyncio.wrap_future(self.submit(cmd, cls))
 
-        if msg.response != msg.PROCESSING:
-            return msg
+    def _io_loop(self):
+        """ The device I/O thread.  Sends queued messages one at a time, in
+        the order submitted, since VISA sessions are not thread safe.
+        Returns at the sentinel queued by close().
+        """
+        while True:
+            msg, future = self._io_queue.get()
+            if msg is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._send(msg)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(msg)
+
+    def _send(self, msg):
+        """ Send a validated msg to the instrument; store results in msg. """
         if self.device is None:
             msg.response = msg.COM_ERR
-            return msg
+            return
 
         if msg.timeout is not None:
             orig_timeout = self.device.timeout
             self.device.timeout = msg.timeout
 
-        if msg.cmd[-1] != '?':
-            self._write(msg)
-        else:
-            self._query(msg)
+        (self._query if msg.is_query else self._write)(msg)
 
         if msg.timeout is not None:
             self.device.timeout = orig_timeout
 
-        return msg
-
 
 def main():
     """ Test with USB connection to Hantek DSO2C10 oscilloscope. """
@@ -0,0 +1,49 @@
+"""Test DSO2C10 oscilloscope helpers."""
+import unittest
+try:
+    import pyvisa # andy.visa.comms needs it; it is not a declared dependency.
+except ImportError as e:
+    raise unittest.SkipTest('pyvisa is not installed') from e
+from andy.oscilloscope.dso2c10_cli import (WAV_DATA_ALL_FAKE, WAVEFORM_STRUCT, DSO2000Msg,
+                                           proc_waveform_data, proc_waveform_data_np)
+
+class TestDSO2000Msg(unittest.TestCase):
+    """Tests DSO2000Msg"""
+    def test_validate_whitespace(self):
+        """ Any whitespace separates the header; only the header is upper cased. """
+        for cmd in ('chan1:scal 20mV', 'chan1:scal\t20mV', 'chan1:scal   20mV',
+                    ' :chan1:scal \t 20mV\n'):
+            self.assertEqual(DSO2000Msg(cmd).cmd, ':CHAN1:SCAL 20mV')
+        self.assertEqual(DSO2000Msg('wav:data:all?').cmd, ':WAV:DATA:ALL?')
+
+class TestProcWaveformData(unittest.TestCase):
+    """Tests proc_waveform_data"""
+    def assert_paths_agree(self, text):
+        """ The str and bytes paths must give the same fields. """
+        from_str = proc_waveform_data(text)
+        from_bytes = proc_waveform_data(text.encode())
+        self.assertEqual(from_str, {key: val.decode() for key, val in from_bytes.items()})
+
+    def test_full_header(self):
+        """ A full length header is unpacked the same from str and bytes. """
+        self.assert_paths_agree(WAV_DATA_ALL_FAKE.ljust(WAVEFORM_STRUCT.size, '0'))
+
+    def test_canned_response(self):
+        """ The canned response is shorter than the header. """
+        self.assertLess(len(WAV_DATA_ALL_FAKE), WAVEFORM_STRUCT.size)
+        self.assert_paths_agree(WAV_DATA_ALL_FAKE)
+        self.assert_paths_agree(WAV_DATA_ALL_FAKE + '0' * 200)
+
+
+class TestProcWaveformDataNp(unittest.TestCase):
+    """Tests proc_waveform_data_np"""
+    def test_canned_response(self):
+        """ Numeric fields that do not parse are left as str. """
+        try:
+            d = proc_waveform_data_np(WAV_DATA_ALL_FAKE)
+        except ImportError:
+            self.skipTest('numpy is not installed')
+        self.assertEqual(d['packet byte length'], 128)
+        self.assertEqual(d['ch3 voltage'], '184.9e-')
+        self.assertEqual(d['sampling multiple'], 'e+0400')
+        self.assertEqual(len(d['samples']), 0)
@@ -2,8 +2,10 @@
 import unittest
 import time
 import asyncio
+import struct
 import logging
-from andy.pingable import Pingable, compare_subnets, compare_dicts
+from andy.pingable import (IPv4Net, Pingable, IcmpEcho, compare_subnets, compare_dicts,
+                           icmp_checksum)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -17,6 +19,13 @@ class TestPingable(unittest.TestCase):
                   '1.0.0.6']
         self.assertEqual(p.ips, answer)
 
+    def test_ips_matches_hosts(self):
+        """ ips() must list the same hosts as hosts(), including /31 and /32. """
+        for address in ('10.0.0.0/24', '10.0.0.8/29', '10.0.0.2/31', '10.0.0.3/32'):
+            p = Pingable(IPv4Net(address))
+            answer = [ip.exploded for ip in p.network.hosts()]
+            self.assertEqual(p.ips(), answer)
+
     def test_ip_ignore_list(self):
         """ Testing ip_ignore_list assignment and bad values. """
         p = Pingable()
@@ -34,6 +43,80 @@ class TestPingable(unittest.TestCase):
         answer = {'1.0.0.3': [True, False], '1.0.0.4': [False, True]}
         self.assertEqual(result, answer)
 
+class TestIPv4Net(unittest.TestCase):
+    """Tests IPv4Net class"""
+    def test_from_string_fast(self):
+        """ Fast /24 path must match the general constructor. """
+        for address in ('192.168.1.7/24', '10.0.0.0/24', '255.255.255.255/24',
+                        '1.2.3.4/16', '1.2.3.4/024'):
+            self.assertEqual(IPv4Net.from_string_fast(address), IPv4Net(address))
+        for address in ('01.2.3.4/24', '1.2.3.256/24', '1.2.3/24'):
+            with self.assertRaises(ValueError):
+                IPv4Net.from_string_fast(address)
+
+class TestIcmpEcho(unittest.TestCase):
+    """Tests the ICMP echo helpers without opening a socket."""
+    class FakeSocket():
+        """ Returns queued (data, address) pairs, then would block. """
+        def __init__(self, packets):
+            self.packets = list(packets)
+
+        def recvfrom(self, _):
+            if not self.packets:
+                raise BlockingIOError
+            return self.packets.pop(0)
+
+    @staticmethod
+    def reply(ident, seq, ip_header=False):
+        """ An echo reply, optionally behind a 20 byte IPv4 header. """
+        data = struct.pack('!BBHHH', 0, 0, 0, ident, seq) + bytes(32)
+        if ip_header:
+            data = b'\x45' + bytes(19) + data
+        return data
+
+    def echo(self, packets, raw):
+        """ An IcmpEcho reading packets from a fake socket. """
+        icmp = IcmpEcho.__new__(IcmpEcho)
+        icmp._sock = self.FakeSocket(packets)
+        icmp._raw = raw
+        icmp._pending = {}
+        return icmp
+
+    def test_icmp_checksum(self):
+        """ RFC 1071 example, and odd length data is zero padded. """
+        self.assertEqual(icmp_checksum(bytes.fromhex('0001f203f4f5f6f7')), 0x220d)
+        self.assertEqual(icmp_checksum(b'\x01'), icmp_checksum(b'\x01\x00'))
+
+    def test_packet(self):
+        """ An echo request with our ident and seq that checksums to zero. """
+        packet = IcmpEcho.__new__(IcmpEcho)._packet(513)
+        self.assertEqual(struct.unpack_from('!BBxxHH', packet),
+                         (8, 0, IcmpEcho.IDENT, 513))
+        self.assertEqual(icmp_checksum(packet), 0)
+
+    def test_on_readable(self):
+        """ Replies resolve their (ip, seq) request.  The IP header is
+            stripped, and raw sockets drop replies with another ident.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            other = (IcmpEcho.IDENT + 1) & 0xffff
+            icmp = self.echo([(self.reply(other, 1, True), ('1.0.0.1', 0)),
+                              (self.reply(IcmpEcho.IDENT, 2, True), ('1.0.0.2', 0))], raw=True)
+            icmp._pending = {('1.0.0.1', 1): loop.create_future(),
+                             ('1.0.0.2', 2): loop.create_future()}
+            icmp._on_readable()
+            self.assertFalse(icmp._pending[('1.0.0.1', 1)].done())
+            self.assertTrue(icmp._pending[('1.0.0.2', 2)].result())
+
+            # Datagram sockets get only their own replies, ident rewritten.
+            icmp = self.echo([(self.reply(other, 3), ('1.0.0.3', 0))], raw=False)
+            icmp._pending = {('1.0.0.3', 3): loop.create_future()}
+            icmp._on_readable()
+            self.assertTrue(icmp._pending[('1.0.0.3', 3)].result())
+        finally:
+            loop.close()
+
 def test_compare_subnets():
     """ Testing compare_subnets """
     results = compare_subnets('192.168.0.0/28', '192.168.0.0/28',